@@ -1,192 +1,639 @@
 import requests
+from requests.adapters import HTTPAdapter
+from requests_cache import CachedSession
 import time
 import re
-from bs4 import BeautifulSoup
-from collections import deque
-from urllib.parse import urljoin, urlparse
+from lxml import etree, html as lxml_html
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote, unquote, urlparse
+import os
 import sys
 import threading
 
+# Предел размера страницы, передаваемой на разбор. Он защищает от аномально больших
+# ответов; обычные статьи разбираются целиком, так как раздел References находится в конце.
+# Ответ всё равно загружается полностью: дисковый кеш хранит только целые ответы
+MAX_PAGE_BYTES = 4 * 1024 * 1024
+
+# Дисковый кеш ответов (SQLite), общий для обоих направлений поиска и повторных запусков
+CACHE_NAME = 'wiki_cache'
+CACHE_EXPIRE_AFTER = 24 * 3600
+
+# Потоки для разбора HTML: lxml отпускает GIL во время разбора
+PARSE_WORKERS = os.cpu_count() or 1
+
+# Сколько статей MediaWiki API принимает в одном запросе (titles=A|B|...)
+API_BATCH_SIZE = 50
+
+# Ожидаемое число соседей статьи, ссылки которой ещё не загружены;
+# используется для оценки стоимости раскрытия фронта во встречном поиске
+EXPECTED_DEGREE = 100
+
+# Сколько статей хранить в кешах ссылок и обратных ссылок
+LINKS_CACHE_SIZE = 1024
+
+# Источники ссылок: разбор HTML статьи, MediaWiki API (prop=links, пачками статей)
+# или список ссылок отрисованной статьи (action=parse, только существующие статьи)
+LINK_SOURCES = ('html', 'api', 'parse')
+
+# Служебные пространства имён, ссылки на которые не считаются статьями.
+# В href нелатинские названия закодированы, поэтому в выражение попадают обе формы
+EXCLUDED_NAMESPACES = (
+    'File', 'Category', 'Template', 'Help', 'Special',
+    'User', 'Wikipedia', 'Talk', 'User_talk', 'Wikipedia_talk',
+    'Template_talk', 'Help_talk', 'Category_talk', 'Portal',
+    'Файл', 'Категория', 'Шаблон', 'Справка', 'Участник',
+    'Обсуждение', 'Служебная', 'Портал',
+)
+EXCLUDED_LINK_RE = re.compile(
+    r'/wiki/(?:'
+    + '|'.join(re.escape(form) for ns in EXCLUDED_NAMESPACES for form in {ns, quote(ns)})
+    + r'):'
+)
+
+# XPath-выражения для разбора статьи, компилируются один раз.
+# Ссылки внутри навигационных шаблонов, карточек и служебных плашек не учитываются
+EXCLUDED_BLOCK_CLASSES = ('navbox', 'infobox', 'metadata', 'ambox')
+
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_NOT_IN_EXCLUDED_BLOCK = 'not(ancestor::div[{}])'.format(
+    ' or '.join(_has_class(name) for name in EXCLUDED_BLOCK_CLASSES)
+)
+_SECTION_HEADING = f"self::h2 or self::div[{_has_class('mw-heading2')}]"
+
+MAIN_CONTENT_HREFS = etree.XPath(
+    f"(//div[@id='mw-content-text']//div[{_has_class('mw-parser-output')}])[1]"
+    f"//*[self::p or self::li]//a[@href][{_NOT_IN_EXCLUDED_BLOCK}]/@href",
+    smart_strings=False,
+)
+REFERENCES_HEADINGS = etree.XPath("//h2[@id='References' or span[@id='References']]")
+REFERENCES_TITLE_RE = re.compile(r'References|Примечания|Источники')
+# Номер раздела — число заголовков второго уровня перед ним; ссылки раздела —
+# все ссылки из следующих соседей до очередного заголовка
+SECTION_NUMBER = etree.XPath(f"count(preceding-sibling::*[{_SECTION_HEADING}])")
+SECTION_HREFS = etree.XPath(
+    f"following-sibling::*[count(preceding-sibling::*[{_SECTION_HEADING}]) = $n]"
+    f"[not({_SECTION_HEADING})]/descendant-or-self::a[@href][{_NOT_IN_EXCLUDED_BLOCK}]/@href",
+    smart_strings=False,
+)
+
+# Символы, которые MediaWiki оставляет в URL статьи без кодирования
+WIKI_URL_SAFE_CHARS = ";@$!*(),/~:"
+
+# Проверка и нормализация ссылок вызываются для каждой ссылки каждой статьи,
+# поэтому это функции модуля над строками, без обращений к атрибутам объекта
+def is_valid_wikipedia_link(href):
+    """Проверка, является ли ссылка (вида /wiki/...) валидной ссылкой на статью Wikipedia"""
+    if not href.startswith('/wiki/') or '#' in href:
+        return False
+
+    return EXCLUDED_LINK_RE.match(href) is None
+
+def normalize_url(url):
+    """Нормализация URL для сравнения: без фрагмента, параметров и завершающего слэша"""
+    for separator in ('#', '?'):
+        index = url.find(separator)
+        if index >= 0:
+            url = url[:index]
+    return url.rstrip('/')
+
+def is_cacheable_response(response):
+    """Ответы MediaWiki API с ошибкой приходят с кодом 200 и не должны попадать в дисковый кеш"""
+    if '/w/api.php' not in response.url:
+        return True
+
+    try:
+        return 'error' not in response.json()
+    except ValueError:
+        return False
+
+class PartialLinks(frozenset):
+    """Неполный список соседей, загрузка которого остановлена на найденном узле встречи"""
+
+    def __new__(cls, links, meeting_url):
+        self = super().__new__(cls, links)
+        self.meeting_url = meeting_url
+        return self
+
+class LRUCache:
+    """Потокобезопасный кеш ограниченного размера: вытесняются давно не использованные записи"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is not None:
+                self.data.move_to_end(key)
+            return value
+
+    def peek(self, key):
+        """Чтение без изменения порядка вытеснения"""
+        with self.lock:
+            return self.data.get(key)
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
 class WikipediaPathFinder:
-    def __init__(self, rate_limit=10):
+    def __init__(self, rate_limit=10, link_source='html'):
+        if link_source not in LINK_SOURCES:
+            raise ValueError(f"Неизвестный источник ссылок: {link_source}")
+
         self.rate_limit = rate_limit
-        self.session = requests.Session()
+        self.link_source = link_source
+        # Через API ссылки загружаются пачками статей, HTML — по одной странице
+        self.links_batch_size = API_BATCH_SIZE if link_source == 'api' else 1
+        self.session = CachedSession(
+            CACHE_NAME,
+            backend='sqlite',
+            allowable_codes=(200,),
+            expire_after=CACHE_EXPIRE_AFTER,
+            filter_fn=is_cacheable_response,
+        )
+        # Пул соединений на rate_limit потоков: keep-alive соединения переиспользуются,
+        # а не закрываются и не открываются заново с новым TLS-рукопожатием
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=rate_limit, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.session.headers.update({
             'User-Agent': 'WikipediaPathFinder/1.0 (Educational Purpose)'
         })
-        self.cache = {}
-        self.semaphore = threading.Semaphore(rate_limit)
-        self.request_times = deque()
+        self.links_cache = LRUCache(LINKS_CACHE_SIZE)
+        self.backlinks_cache = LRUCache(LINKS_CACHE_SIZE)
+        self.tokens = rate_limit
+        self.last_refill = time.monotonic()
+        self.rate_lock = threading.Lock()
 
     def _rate_limit_request(self):
-        """Ограничение скорости запросов"""
-        current_time = time.time()
+        """Ограничение скорости запросов (token bucket, общий для всех потоков)"""
+        with self.rate_lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.rate_limit,
+                self.tokens + (now - self.last_refill) * self.rate_limit,
+            )
+            self.last_refill = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+
+            # Ждём, пока накопится один токен, и сразу его расходуем
+            time.sleep((1 - self.tokens) / self.rate_limit)
+            self.tokens = 0
+            self.last_refill = time.monotonic()
+
+    def _get(self, url, **kwargs):
+        """GET-запрос: ответ из кеша возвращается сразу, в сеть — с ограничением скорости"""
+        # Если ответа нет в кеше, requests_cache возвращает 504 без обращения к сети
+        response = self.session.get(url, only_if_cached=True, timeout=10, **kwargs)
+        if response.status_code == 504:
+            self._rate_limit_request()
+            response = self.session.get(url, timeout=10, **kwargs)
 
-        while self.request_times and current_time - self.request_times[0] > 1:
-            self.request_times.popleft()
+        response.raise_for_status()
+        return response
 
-        if len(self.request_times) >= self.rate_limit:
-            sleep_time = 1 - (current_time - self.request_times[0])
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+    def get_page_content(self, url):
+        """Получение содержимого страницы (байты HTML) с кешированием"""
+        try:
+            content = self._get(url, headers={'Accept': 'text/html'}).content
+            return content[:MAX_PAGE_BYTES]
 
-        self.request_times.append(current_time)
+        except requests.RequestException as e:
+            print(f"Ошибка при получении {url}: {e}")
+            return None
 
-    def get_page_content(self, url):
-        """Получение содержимого страницы с кешированием"""
-        if url in self.cache:
-            return self.cache[url]
+    def _api_request(self, wiki_domain, params):
+        """Запрос к MediaWiki API с ограничением скорости"""
+        api_url = f"https://{wiki_domain}/w/api.php"
 
-        with self.semaphore:
-            self._rate_limit_request()
+        try:
+            data = self._get(api_url, params=params).json()
 
-            try:
-                response = self.session.get(url, timeout=10)
-                response.raise_for_status()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Ошибка при запросе к {api_url}: {e}")
+            return None
 
-                self.cache[url] = response.text
-                return response.text
+        # MediaWiki сообщает об ошибках телом ответа с кодом 200
+        if 'error' in data:
+            print(f"Ошибка API {api_url}: {data['error'].get('info', data['error'])}")
+            return None
 
-            except requests.RequestException as e:
-                print(f"Ошибка при получении {url}: {e}")
-                return None
+        return data
 
     def extract_wikipedia_links(self, html_content, base_url):
         """Извлечение ссылок на Wikipedia из основного содержимого и References"""
         if not html_content:
             return set()
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        links = set()
+        try:
+            tree = lxml_html.document_fromstring(html_content)
+        except etree.ParserError:
+            # Тело из одних пробелов или комментариев: ссылок в нём нет
+            return set()
 
         parsed_url = urlparse(base_url)
-        wiki_domain = parsed_url.netloc
-
-        main_content = soup.find('div', {'id': 'mw-content-text'})
-        if main_content:
-            for element in main_content.find_all(
-                    ['div'], class_=[
-                        'navbox',
-                        'infobox',
-                        'metadata',
-                        'ambox',
-                    ]
-            ):
-                element.decompose()
-
-            content_div = main_content.find('div', class_='mw-parser-output')
-            if content_div:
-                for p in content_div.find_all(['p', 'li']):
-                    for link in p.find_all('a', href=True):
-                        href = link['href']
-                        if self._is_valid_wikipedia_link(href, wiki_domain):
-                            full_url = urljoin(base_url, href)
-                            links.add(full_url)
-
-        references_section = soup.find('span', {'id': 'References'})
-        if not references_section:
-            references_section = soup.find(
-                'h2',
-                string=re.compile(r'References|Примечания|Источники'),
-            )
+        wiki_root = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        wiki_prefix = f"{wiki_root}/wiki/"
+
+        hrefs = MAIN_CONTENT_HREFS(tree)
+
+        references = REFERENCES_HEADINGS(tree)
+        if not references:
+            references = [
+                h2 for h2 in tree.iter('h2')
+                if REFERENCES_TITLE_RE.search(h2.text_content())
+            ]
+
+        if references:
+            # В современной разметке h2 обёрнут в div.mw-heading, и соседями раздела
+            # являются соседи обёртки
+            section_start = references[0]
+            parent = section_start.getparent()
+            if parent is not None and 'mw-heading' in parent.get('class', '').split():
+                section_start = parent
 
-        if references_section:
-            current = references_section.parent if references_section.parent else references_section
-            while current and current.next_sibling:
-                current = current.next_sibling
-                if hasattr(current, 'find_all'):
-                    for link in current.find_all('a', href=True):
-                        href = link['href']
-                        if self._is_valid_wikipedia_link(href, wiki_domain):
-                            full_url = urljoin(base_url, href)
-                            links.add(full_url)
-                    if current.name == 'h2':
-                        break
+            section_number = SECTION_NUMBER(section_start) + 1
+            hrefs += SECTION_HREFS(section_start, n=section_number)
+
+        links = set()
+        for href in hrefs:
+            # Абсолютные ссылки на тот же раздел Wikipedia приводятся к виду /wiki/...
+            if href.startswith(wiki_prefix):
+                href = href[len(wiki_root):]
+
+            if is_valid_wikipedia_link(href):
+                links.add(wiki_root + href)
 
         return links
 
-    def _is_valid_wikipedia_link(self, href, wiki_domain):
-        """Проверка, является ли ссылка валидной ссылкой на статью Wikipedia"""
-        if not href:
-            return False
-
-        if href.startswith('/wiki/'):
-            excluded_prefixes = [
-                'File:', 'Category:', 'Template:', 'Help:', 'Special:',
-                'User:', 'Wikipedia:', 'Talk:', 'User_talk:', 'Wikipedia_talk:',
-                'Template_talk:', 'Help_talk:', 'Category_talk:', 'Portal:',
-                'Файл:', 'Категория:', 'Шаблон:', 'Справка:', 'Участник:',
-                'Обсуждение:', 'Служебная:', 'Портал:'
-            ]
+    def title_to_url(self, title, wiki_domain):
+        """Построение URL статьи по названию в том же виде, что и в ссылках Wikipedia"""
+        path = quote(title.replace(' ', '_'), safe=WIKI_URL_SAFE_CHARS)
+        return f"https://{wiki_domain}/wiki/{path}"
+
+    def url_to_title(self, url):
+        """Получение названия статьи из URL"""
+        path = urlparse(url).path.rsplit('/wiki/', 1)[-1]
+        return unquote(path).replace('_', ' ')
+
+    def fetch_links(self, urls):
+        """Ссылки статей через MediaWiki API, без загрузки и разбора HTML: словарь URL -> ссылки (None при ошибке)"""
+        wiki_domain = urlparse(urls[0]).netloc
+        titles = {url: self.url_to_title(url) for url in urls}
+        params = {
+            'action': 'query',
+            'prop': 'links',
+            'titles': '|'.join(titles.values()),
+            'redirects': 1,
+            'plnamespace': 0,
+            'pllimit': 'max',
+            'format': 'json',
+        }
+
+        links_by_title = {}
+        renamed = {}
+        while True:
+            data = self._api_request(wiki_domain, params)
+            if data is None:
+                return None
+
+            query = data.get('query', {})
+            for item in query.get('normalized', []) + query.get('redirects', []):
+                renamed[item['from']] = item['to']
+
+            # При продолжении (plcontinue) ссылки одной статьи могут прийти в нескольких ответах
+            for page in query.get('pages', {}).values():
+                links_by_title.setdefault(page['title'], set()).update(
+                    self.title_to_url(link['title'], wiki_domain)
+                    for link in page.get('links', [])
+                )
+
+            if 'continue' not in data:
+                break
+            params.update(data['continue'])
+
+        result = {}
+        for url, title in titles.items():
+            # Название могло быть нормализовано, а затем разрешено как перенаправление
+            title = renamed.get(title, title)
+            title = renamed.get(title, title)
+            result[url] = links_by_title.get(title, set())
+        return result
+
+    def fetch_page_links(self, url):
+        """Ссылки отрисованной статьи через action=parse, без ссылок на несуществующие статьи (None при ошибке)"""
+        wiki_domain = urlparse(url).netloc
+        params = {
+            'action': 'parse',
+            'page': self.url_to_title(url),
+            'redirects': 1,
+            'prop': 'links',
+            'format': 'json',
+        }
+
+        data = self._api_request(wiki_domain, params)
+        if data is None or 'parse' not in data:
+            return None
+
+        return {
+            self.title_to_url(link['*'], wiki_domain)
+            for link in data['parse'].get('links', [])
+            if link['ns'] == 0 and 'exists' in link
+        }
+
+    def _load_links(self, urls):
+        """Первый этап получения ссылок: словарь URL -> готовое множество (кеш, API) или байты HTML"""
+        result = {}
+        missing = []
+        for url in urls:
+            links = self.links_cache.get(url)
+            if links is not None:
+                result[url] = links
+            else:
+                missing.append(url)
+
+        if not missing:
+            return result
+
+        if self.link_source == 'html':
+            for url in missing:
+                content = self.get_page_content(url)
+                result[url] = frozenset() if content is None else content
+            return result
+
+        if self.link_source == 'parse':
+            fetched = {url: self.fetch_page_links(url) for url in missing}
+        else:
+            fetched = self.fetch_links(missing)
 
-            if '#' in href:
-                return False
+        for url in missing:
+            if fetched is None or fetched[url] is None:
+                result[url] = frozenset()
+                continue
 
-            for prefix in excluded_prefixes:
-                if href.startswith(f'/wiki/{prefix}'):
-                    return False
+            links = frozenset(fetched[url])
+            self.links_cache[url] = links
+            result[url] = links
 
-            return True
+        return result
 
-        if wiki_domain in href and '/wiki/' in href:
-            return self._is_valid_wikipedia_link(
-                href.split('/wiki/')[-1],
-                wiki_domain,
-            )
+    def _parse_links(self, content, url):
+        """Второй этап для HTML: извлечение и нормализация ссылок"""
+        links = frozenset(map(normalize_url, self.extract_wikipedia_links(content, url)))
+        self.links_cache[url] = links
+        return links
 
-        return False
+    def get_links(self, url):
+        """Нормализованные ссылки из статьи (прямые рёбра графа) с кешированием"""
+        links = self._load_links([url])[url]
+        if isinstance(links, bytes):
+            links = self._parse_links(links, url)
+        return links
 
-    def normalize_url(self, url):
-        """Нормализация URL для сравнения"""
-        parsed = urlparse(url)
-        normalized = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
-        return normalized.rstrip('/')
+    def get_backlinks(self, url, stop=None):
+        """Статьи, ссылающиеся на данную (обратные рёбра графа), через MediaWiki API"""
+        # stop(url, ссылки) проверяет каждую страницу ответа по мере получения. Если она
+        # вернула узел встречи, остальные страницы не загружаются: неполный список
+        # возвращается вместе с этим узлом и не кешируется
+        backlinks = self.backlinks_cache.get(url)
+        if backlinks is not None:
+            return backlinks
+
+        wiki_domain = urlparse(url).netloc
+        params = {
+            'action': 'query',
+            'list': 'backlinks',
+            'bltitle': self.url_to_title(url),
+            'blnamespace': 0,
+            # Перенаправления — не статьи: иначе путь проходил бы через псевдоним цели
+            'blfilterredir': 'nonredirects',
+            'bllimit': 'max',
+            'format': 'json',
+        }
+
+        backlinks = set()
+        while True:
+            data = self._api_request(wiki_domain, params)
+            if data is None:
+                return frozenset(backlinks)
+
+            page_backlinks = {
+                self.title_to_url(page['title'], wiki_domain)
+                for page in data.get('query', {}).get('backlinks', [])
+            }
+            backlinks |= page_backlinks
+
+            if 'continue' not in data:
+                break
+            meeting_url = None if stop is None else stop(url, page_backlinks)
+            if meeting_url is not None:
+                return PartialLinks(backlinks, meeting_url)
+            params.update(data['continue'])
+
+        backlinks = frozenset(backlinks)
+        self.backlinks_cache[url] = backlinks
+        return backlinks
+
+    def _load_backlinks(self, urls, stop=None):
+        """Обратные ссылки для группы URL (API отдаёт их по одной статье за запрос)"""
+        return {url: self.get_backlinks(url, stop) for url in urls}
+
+    def _fetch_layer(self, urls, load, batch_size=1):
+        """Параллельная загрузка соседей для всего слоя BFS; выдаёт пары (url, соседи) по мере готовности"""
+        # Загрузчик получает группу из batch_size URL и возвращает для каждого либо готовые
+        # соседи, либо байты HTML. Загрузка и разбор HTML идут в разных пулах: пока
+        # страница разбирается, сетевые потоки уже загружают следующие
+        urls = list(urls)
+        fetch_pool = ThreadPoolExecutor(max_workers=self.rate_limit)
+        parse_pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS)
+        try:
+            pending = {
+                fetch_pool.submit(load, urls[i:i + batch_size])
+                for i in range(0, len(urls), batch_size)
+            }
+            parsing = {}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in parsing:
+                        yield parsing.pop(future), future.result()
+                        continue
+
+                    for url, result in future.result().items():
+                        if isinstance(result, bytes):
+                            parse_future = parse_pool.submit(self._parse_links, result, url)
+                            parsing[parse_future] = url
+                            pending.add(parse_future)
+                        else:
+                            yield url, result
+        finally:
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
+            parse_pool.shutdown(wait=False, cancel_futures=True)
 
     def find_path(self, start_url, target_url, max_depth=5):
         """Поиск пути между двумя статьями Wikipedia с использованием BFS"""
-        start_url = self.normalize_url(start_url)
-        target_url = self.normalize_url(target_url)
+        start_url = normalize_url(start_url)
+        target_url = normalize_url(target_url)
 
         if start_url == target_url:
             return [start_url]
 
-        visited = set()
-        queue = deque([(start_url, [start_url])])
-        visited.add(start_url)
+        parents = {start_url: None}
+        layer = {start_url}
+        depth = 1
 
-        while queue:
-            current_url, path = queue.popleft()
+        while layer:
+            next_layer = set()
 
-            if len(path) > max_depth:
-                continue
+            layer_links = self._fetch_layer(layer, self._load_links, self.links_batch_size)
+            for current_url, links in layer_links:
+                print(f"Обрабатываю: {current_url} (глубина: {depth})")
 
-            print(f"Обрабатываю: {current_url} (глубина: {len(path)})")
+                if target_url in links:
+                    parents[target_url] = current_url
+                    return self._build_path(target_url, parents, {target_url: None})
 
-            content = self.get_page_content(current_url)
-            if not content:
-                continue
+                if depth >= max_depth:
+                    continue
+
+                new_links = links.difference(parents)
+                parents.update(dict.fromkeys(new_links, current_url))
+                next_layer |= new_links
 
-            links = self.extract_wikipedia_links(content, current_url)
+            layer = next_layer
+            depth += 1
 
-            for link in links:
-                normalized_link = self.normalize_url(link)
+        return None
+
+    def _expand_frontier(self, frontier, parents, other_parents, load, batch_size, label, is_meeting):
+        """Раскрытие одного слоя BFS; возвращает новый фронт и узел встречи, прошедший проверку is_meeting"""
+        new_frontier = set()
+
+        for url, links in self._fetch_layer(frontier, load, batch_size):
+            print(f"Обрабатываю ({label}): {url}")
+
+            # Операции над множествами выполняются в C, без цикла по ссылкам в Python
+            new_links = links.difference(parents)
+            parents.update(dict.fromkeys(new_links, url))
+            new_frontier |= new_links
+
+            # Неполный список обратных ссылок оборван на уже проверенной встрече. Её
+            # принимаем сразу: узел мог быть добавлен в этом же слое с другим родителем,
+            # и без этого поиск продолжился бы с урезанным списком
+            meeting_url = getattr(links, 'meeting_url', None)
+            if meeting_url is not None:
+                parents[meeting_url] = url
+                return new_frontier, meeting_url
+
+            for meeting_url in new_links & other_parents.keys():
+                if is_meeting(meeting_url):
+                    return new_frontier, meeting_url
+
+        return new_frontier, None
+
+    def _expansion_cost(self, frontier, cache):
+        """Оценка стоимости раскрытия фронта: сумма известных (из кеша) или ожидаемых степеней"""
+        cost = 0
+        for url in frontier:
+            neighbours = cache.peek(url)
+            cost += EXPECTED_DEGREE if neighbours is None else len(neighbours)
+        return cost
+
+    def _chain(self, url, parents):
+        """Цепочка от url по указателям на родителей до корня поиска"""
+        chain = []
+        while url is not None:
+            chain.append(url)
+            url = parents[url]
+        return chain
+
+    def _build_path(self, meeting_url, parents_fwd, parents_bwd):
+        """Восстановление пути по указателям на родителей из обоих поисков"""
+        path = self._chain(meeting_url, parents_fwd)
+        path.reverse()
+        return path + self._chain(parents_bwd[meeting_url], parents_bwd)
+
+    def _backward_path_valid(self, path):
+        """Проверка, что рёбра обратной части пути есть среди ссылок статей"""
+        # list=backlinks учитывает и ссылки из шаблонов, которые разбор HTML отбрасывает
+        if self.link_source != 'html':
+            return True
 
-                if normalized_link == target_url:
-                    return path + [normalized_link]
+        return all(child in self.get_links(parent) for parent, child in zip(path, path[1:]))
 
-                if normalized_link not in visited and len(path) < max_depth:
-                    visited.add(normalized_link)
-                    queue.append((normalized_link, path + [normalized_link]))
+    def find_meet_in_middle(self, url1, url2, max_depth=5):
+        """Поиск пути от url1 к url2 встречным BFS: по ссылкам от url1 и по обратным ссылкам от url2"""
+        start_url = normalize_url(url1)
+        target_url = normalize_url(url2)
+
+        if start_url == target_url:
+            return [start_url]
+
+        parents_fwd = {start_url: None}
+        parents_bwd = {target_url: None}
+        frontier_fwd = {start_url}
+        frontier_bwd = {target_url}
+        depth_fwd = depth_bwd = 0
+
+        def is_meeting(url):
+            return self._backward_path_valid(self._chain(url, parents_bwd))
+
+        def backlinks_meet(url, backlinks):
+            # Встреча уже на очередной странице обратных ссылок: остальные не нужны
+            chain = self._chain(url, parents_bwd)
+            for link in backlinks & parents_fwd.keys():
+                if link not in parents_bwd and self._backward_path_valid([link] + chain):
+                    return link
+            return None
+
+        def load_backlinks(urls):
+            return self._load_backlinks(urls, backlinks_meet)
+
+        while frontier_fwd and frontier_bwd and depth_fwd + depth_bwd < max_depth:
+            # Раскрываем сторону с меньшей ожидаемой стоимостью: в графе Wikipedia
+            # степени статей сильно различаются, и простое чередование тратит загрузки
+            cost_fwd = self._expansion_cost(frontier_fwd, self.links_cache)
+            cost_bwd = self._expansion_cost(frontier_bwd, self.backlinks_cache)
+            if cost_fwd <= cost_bwd:
+                depth_fwd += 1
+                frontier_fwd, meeting_url = self._expand_frontier(
+                    frontier_fwd, parents_fwd, parents_bwd,
+                    self._load_links, self.links_batch_size, f"вперёд, глубина {depth_fwd}",
+                    is_meeting,
+                )
+            else:
+                depth_bwd += 1
+                frontier_bwd, meeting_url = self._expand_frontier(
+                    frontier_bwd, parents_bwd, parents_fwd,
+                    load_backlinks, 1, f"назад, глубина {depth_bwd}",
+                    is_meeting,
+                )
+
+            if meeting_url is not None:
+                return self._build_path(meeting_url, parents_fwd, parents_bwd)
 
         return None
 
     def find_bidirectional_path(self, url1, url2, max_depth=5):
         """Поиск пути в обоих направлениях"""
         print(f"Поиск пути от {url1} к {url2}")
-        path1to2 = self.find_path(url1, url2, max_depth)
+        path1to2 = self.find_meet_in_middle(url1, url2, max_depth)
 
         print(f"\nПоиск пути от {url2} к {url1}")
-        path2to1 = self.find_path(url2, url1, max_depth)
+        path2to1 = self.find_meet_in_middle(url2, url1, max_depth)
 
         return path1to2, path2to1
 
@@ -208,8 +655,10 @@ def format_path(path):
     return " => ".join(formatted_links)
 
 def main():
-    if len(sys.argv) != 4:
-        print("Использование: python script.py <url1> <url2> <rate_limit>")
+    link_source = sys.argv[4] if len(sys.argv) == 5 else 'html'
+
+    if len(sys.argv) not in (4, 5) or link_source not in LINK_SOURCES:
+        print(f"Использование: python script.py <url1> <url2> <rate_limit> [{'|'.join(LINK_SOURCES)}]")
         print("Пример: python script.py 'https://en.wikipedia.org/wiki/Six_degrees_of_separation' 'https://en.wikipedia.org/wiki/American_Broadcasting_Company' 10")
         return
 
@@ -217,7 +666,7 @@ def main():
     url2 = sys.argv[2]
     rate_limit = int(sys.argv[3])
 
-    finder = WikipediaPathFinder(rate_limit)
+    finder = WikipediaPathFinder(rate_limit, link_source)
 
     try:
         path1to2, path2to1 = finder.find_bidirectional_path(url1, url2)